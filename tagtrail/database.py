@@ -25,20 +25,60 @@
 
 """
 from abc import ABC, abstractmethod
-from functools import partial
 import csv
+import functools
+import io
 import datetime
 import slugify
 import copy
 import re
 import itertools
+import operator
 import configparser
 import logging
+import sys
 from decimal import Decimal
-from collections import UserDict, UserList
 
 from . import helpers
 
+# descriptions slugify.slugify returns unchanged
+_sluggedDescription = re.compile(r'[a-z0-9]+(?:-[a-z0-9]+)*')
+
+@functools.lru_cache(maxsize=4096)
+def _productId(description):
+    """
+    Product id for a description, as slugify.slugify computes it.
+
+    slugify runs unicode normalization and several regex passes. The same
+    descriptions are slugified again whenever products are read, copied or
+    created for sheets, so results are memoized, and descriptions which are
+    already valid slugs are returned as they are.
+    """
+    if _sluggedDescription.fullmatch(description):
+        return description
+    return slugify.slugify(description)
+
+def _unquotedCsvRows(data, delimiter):
+    """
+    Split csv data into rows the same way csv.reader does, provided data
+    contains no quote characters at all.
+
+    Without quoting, a row is a line and a field is whatever lies between two
+    delimiters - plain str.split does that without csv.reader's state machine.
+
+    :param data: content of a csv file, read with newline=''
+    :type data: str
+    :param delimiter: field delimiter
+    :type delimiter: str
+    :return: generator yielding each row as list of str
+    :rtype: generator
+    """
+    lines = data.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    if lines[-1] == '':
+        # csv.reader yields no row after the final line break
+        lines.pop()
+    return (line.split(delimiter) if line else [] for line in lines)
+
 class Database(ABC):
     """
     Simple in-memory data storage for all entities which
@@ -65,6 +105,7 @@ class Database(ABC):
         self.logger.info(f'Reading configuration from {configFilePath}')
         self.configFilePath = configFilePath
         self.config.read(configFilePath)
+        self._csvLayouts = {}
         self.logger.info(f'Reading members from {self.memberFilePath}')
         self.members = self.readCsv(self.memberFilePath, MemberDict)
         self.logger.info(f'Reading products from {self.productFilePath}')
@@ -73,113 +114,195 @@ class Database(ABC):
     def writeConfig(self):
         with open(self.configFilePath, 'w') as configFile:
             self.config.write(configFile)
+        self._csvLayouts.clear()
+
+    def csvLayout(self, containerClass):
+        """
+        Prefix rows and column headers configured for a container class
+
+        Both are parsed from the config (including interpolation) only once
+        per config section and pair of options, and cached until writeConfig
+        is called.
+
+        :param containerClass: DatabaseDict or DatabaseList, or an instance
+        :type containerClass: class
+        :return: prefix rows and column headers
+        :rtype: (tuple of str, tuple of str)
+        """
+        key = (containerClass.configSection(),
+                containerClass.prefixRowsConfigOption(),
+                containerClass.columnHeadersConfigOption())
+        layout = self._csvLayouts.get(key)
+        if layout is None:
+            section, prefixRowsOption, columnHeadersOption = key
+            layout = (
+                    tuple(self.config.getnewlinelist(section, prefixRowsOption)),
+                    tuple(self.config.getnewlinelist(section,
+                        columnHeadersOption)))
+            self._csvLayouts[key] = layout
+        return layout
 
     def readCsv(self, path, containerClass):
         """
         containerClass must be DatabaseDict or DatabaseList
         """
-        def addDbObjectToDict(dbObject, container):
-            if dbObject.id in container:
-                raise ValueError(f'duplicate key {dbObject.id} in {path}')
-            container[dbObject.id] = dbObject
+        try:
+            container, dbObjects = self._csvContent(path, containerClass)
+            container.bulkLoad(dbObjects)
+        except ValueError as e:
+            raise ValueError(f'{path}: {e}') from e
+
+        self.logger.debug(f'read {len(container)} entries from {path}')
+        return container
 
-        def addDbObjectToList(dbObject, container):
-            container.append(dbObject)
+    def iterCsv(self, path, containerClass):
+        """
+        Iterate over the database objects stored in a csv file without
+        collecting them in a container.
+
+        Prefer this over readCsv if the objects are only looked at once, e.g.
+        to filter or sum them up. Prefix rows and column headers are
+        validated before this returns, content rows while iterating. Unlike
+        readCsv, duplicate keys are not detected. Invalid files raise the same
+        ValueError as in readCsv.
+
+        :param path: path to the csv file
+        :type path: str
+        :param containerClass: DatabaseDict or DatabaseList to read
+        :type containerClass: class
+        :return: generator yielding the database objects of all content rows
+        :rtype: generator
+        """
+        try:
+            container, dbObjects = self._csvContent(path, containerClass)
+        except ValueError as e:
+            raise ValueError(f'{path}: {e}') from e
+
+        def dbObjectsWithPathInErrors():
+            try:
+                yield from dbObjects
+            except ValueError as e:
+                raise ValueError(f'{path}: {e}') from e
+        return dbObjectsWithPathInErrors()
+
+    def _csvContent(self, path, containerClass):
+        """
+        Read a csv file written for containerClass
+
+        Prefix rows and column headers are read and validated immediately,
+        the content rows are parsed lazily.
+
+        :param path: path to the csv file
+        :type path: str
+        :param containerClass: DatabaseDict or DatabaseList to read
+        :type containerClass: class
+        :return: an empty container, initialized from the prefix rows, and a
+            generator yielding the database objects of all content rows
+        :rtype: (containerClass, generator)
+        """
+        if not issubclass(containerClass, (DatabaseDict, DatabaseList)):
+            raise TypeError('containerClass must be a DatabaseDict or DatabaseList')
 
         self.logger.debug(f'reading csv file {path}')
-        with open(path, newline=containerClass.newline, encoding=containerClass.encoding) as csvfile:
-            reader = csv.reader(csvfile, delimiter=containerClass.csvDelimiter,
+        with open(path, 'rb', buffering=0) as csvfile:
+            # read the whole file at once, decode it in one go and tokenize
+            # it from memory
+            data = csvfile.read().decode(containerClass.encoding)
+        if containerClass.quotechar in data:
+            reader = csv.reader(io.StringIO(data, newline=containerClass.newline),
+                    delimiter=containerClass.csvDelimiter,
                     quotechar=containerClass.quotechar)
-            prefixRows = self.config.getnewlinelist(
-                    containerClass.configSection(),
-                    containerClass.prefixRowsConfigOption())
-            columnHeaders = self.config.getnewlinelist(
-                    containerClass.configSection(),
-                    containerClass.columnHeadersConfigOption())
-            prefixValues = []
-
-            for cnt, row in enumerate(reader):
-                self.logger.debug(f"row={row}")
-                if cnt<len(prefixRows):
-                    prefixValues.append(
-                            helpers.readPrefixRow(prefixRows[cnt], row))
-
-                elif cnt==len(prefixRows):
-                    for expectedHeader, actualHeader in itertools.zip_longest(columnHeaders, row):
-                        if expectedHeader != actualHeader:
-                            raise ValueError(
-                            f"expectedHeader '{expectedHeader}' != actualHeader '{actualHeader}'")
-
-                    if issubclass(containerClass, DatabaseDict):
-                        container = containerClass(self.config, *prefixValues)
-                        addDbObject = addDbObjectToDict
-                    elif issubclass(containerClass, DatabaseList):
-                        container = containerClass(self.config, *prefixValues)
-                        addDbObject = addDbObjectToList
-                    else:
-                        raise TypeError('containerClass must be a DatabaseDict or DatabaseList')
-
-                else:
-                    vals = []
-                    for val in row:
-                        if containerClass.colInternalDelimiter is None or \
-                        val.find(containerClass.colInternalDelimiter) == -1:
-                            vals.append(val)
-                        else:
-                            vals.append([v.strip() for v in val.split(containerClass.colInternalDelimiter)])
-                    self.logger.debug(f'vals={vals}')
-                    dbObject = container.databaseObjectFromCsvRow(vals)
-                    if not dbObject:
-                        continue
-                    addDbObject(dbObject, container)
-
-            return container
+        else:
+            reader = _unquotedCsvRows(data, containerClass.csvDelimiter)
+        prefixRows, columnHeaders = self.csvLayout(containerClass)
+
+        prefixValues = [helpers.readPrefixRow(prefixRow, row)
+                for prefixRow, row in zip(prefixRows, reader)]
+        if len(prefixValues) != len(prefixRows):
+            raise ValueError('file ends within the prefix rows')
+
+        headerRow = next(reader, [])
+        if tuple(headerRow) != columnHeaders:
+            for expectedHeader, actualHeader in itertools.zip_longest(columnHeaders,
+                    headerRow):
+                if expectedHeader != actualHeader:
+                    raise ValueError(
+                    f"expectedHeader '{expectedHeader}' != actualHeader '{actualHeader}'")
+
+        container = containerClass(self.config, *prefixValues)
+
+        def dbObjects():
+            colInternalDelimiter = containerClass.colInternalDelimiter
+            multiValueColumns = containerClass.multiValueColumns
+            databaseObjectFromCsvRow = container.databaseObjectFromCsvRow
+            for row in reader:
+                for col in multiValueColumns:
+                    if col < len(row):
+                        row[col] = [v.strip() for v in
+                                row[col].split(colInternalDelimiter)] \
+                                if row[col] else []
+                dbObject = databaseObjectFromCsvRow(row)
+                if dbObject:
+                    yield dbObject
+
+        return container, dbObjects()
 
     def writeCsv(self, path, container):
         """
         container must be a DatabaseDict or DatabaseList
         """
-        prefixRows = self.config.getnewlinelist(
-                container.configSection(),
-                container.prefixRowsConfigOption())
-        columnHeaders = self.config.getnewlinelist(
-                container.configSection(),
-                container.columnHeadersConfigOption())
-        self.logger.debug(f'prefixRows={prefixRows}, prefixValues={container.prefixValues()}')
-        assert(len(prefixRows) == len(container.prefixValues()))
+        prefixRows, columnHeaders = self.csvLayout(container)
+        # prefixValues() can be costly (e.g. Bill sums up all positions)
+        prefixValues = container.prefixValues()
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f'prefixRows={prefixRows}, prefixValues={prefixValues}')
+        assert(len(prefixRows) == len(prefixValues))
+
+        lines = []
+        for prefix, val in zip(prefixRows, prefixValues):
+            if prefix == "''":
+                lines.append('')
+            else:
+                lines.append(f'{prefix}{container.csvDelimiter}{val}')
+        lines.append(container.csvDelimiter.join(columnHeaders))
+        for row in container.csvRows():
+            assert(len(row) == len(columnHeaders))
+            lines.append(container.csvDelimiter.join(row))
+        lines.append('')
 
         with open(path, "w+", newline=container.newline, encoding=container.encoding) as fout:
-            for prefix, val in zip(prefixRows,
-                    container.prefixValues()):
-                if prefix == "''":
-                    fout.write('\n')
-                else:
-                    fout.write(f'{prefix}{container.csvDelimiter}{val}\n')
-
-            fout.write(container.csvDelimiter.join(columnHeaders)+"\n")
-            for row in container.csvRows():
-                assert(len(row) == len(columnHeaders))
-                fout.write(container.csvDelimiter.join(row)+"\n")
+            fout.write('\n'.join(lines))
 
 class DatabaseObject(ABC):
+    __slots__ = ('id',)
+
     def __init__(self,
             objId):
         if not isinstance(objId, str):
             raise TypeError('objId must be a string')
         self.id = objId
 
-class DatabaseDict(UserDict):
+class DatabaseDict(dict):
     """
     Base class for dicts Database can handle.
     """
     csvDelimiter = ';'
     colInternalDelimiter = ','
+    # indices of columns holding a colInternalDelimiter separated list,
+    # always passed to databaseObjectFromCsvRow as list of str
+    multiValueColumns = ()
     quotechar = '"'
     newline = ''
     encoding = 'utf-8'
 
     def __init__(self, config, **kwargs):
-        super().__init__(**kwargs)
+        super().__init__()
+        self.update(kwargs)
+
+    def __ior__(self, other):
+        # dict.__ior__ would bypass __setitem__
+        self.update(other)
+        return self
 
     @classmethod
     def configSection(cls):
@@ -206,10 +329,25 @@ class DatabaseDict(UserDict):
     def csvRows(self):
         raise NotImplementedError
 
+    def bulkLoad(self, dbObjects):
+        """
+        Add database objects created by databaseObjectFromCsvRow under their id
+
+        The type checks of __setitem__ are skipped, as the objects are known
+        to be valid - only use this for objects created by this container.
+
+        :param dbObjects: objects to add
+        :type dbObjects: iterable of DatabaseObject
+        :raises ValueError: if an object with the same id is already present
+        """
+        # dict.setdefault inserts and detects duplicates with one lookup
+        setDefault = super().setdefault
+        for dbObject in dbObjects:
+            if setDefault(dbObject.id, dbObject) is not dbObject:
+                raise ValueError(f'duplicate key {dbObject.id}')
+
     def __setitem__(self, key, value):
-        if not isinstance(value, DatabaseObject):
-            raise TypeError('This dict can only hold values of type ' + \
-                    f'{DatabaseObject}. {value} is not.')
+        # containedDatabaseObjectCls() is always a DatabaseObject subclass
         if not isinstance(value, self.containedDatabaseObjectCls()):
             raise TypeError('This dict can only hold values of type ' + \
                     f'{self.containedDatabaseObjectCls()}. {value} is not.')
@@ -218,12 +356,25 @@ class DatabaseDict(UserDict):
                     f'a different key than its id, but {key} != {value.id}.')
         super().__setitem__(key, value)
 
-class DatabaseList(UserList):
+    # dict.update and dict.setdefault would bypass the checks in __setitem__
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+class DatabaseList(list):
     """
     Base class for lists Database can handle.
     """
     csvDelimiter = ';'
     colInternalDelimiter = ','
+    # indices of columns holding a colInternalDelimiter separated list,
+    # always passed to databaseObjectFromCsvRow as list of str
+    multiValueColumns = ()
     quotechar = '"'
     newline = ''
     encoding = 'utf-8'
@@ -252,7 +403,18 @@ class DatabaseList(UserList):
     def csvRows(self):
         raise NotImplementedError
 
+    def bulkLoad(self, dbObjects):
+        """
+        Append database objects created by databaseObjectFromCsvRow
+
+        :param dbObjects: objects to add
+        :type dbObjects: iterable of DatabaseObject
+        """
+        self.extend(dbObjects)
+
 class Member(DatabaseObject):
+    __slots__ = ('name', 'emails', '__balance')
+
     def __init__(self,
             memberId,
             name,
@@ -281,6 +443,7 @@ class Member(DatabaseObject):
 
 class MemberDict(DatabaseDict):
     csvDelimiter = '\t'
+    multiValueColumns = (2,) # emails
     def __init__(self,
             config,
             accountingDate,
@@ -303,30 +466,34 @@ class MemberDict(DatabaseDict):
         return Member
 
     def databaseObjectFromCsvRow(self, rowValues):
-        memberId = rowValues[0]
-        name = rowValues[1] if isinstance(rowValues[1], str) else ", ".join(rowValues[1])
-        if isinstance(rowValues[2], list):
-            emails = rowValues[2]
-        elif rowValues[2] != '':
-            emails = [rowValues[2]]
-        else:
-            emails = []
+        name = rowValues[1]
+        if self.colInternalDelimiter in name:
+            # normalize names given as list, but leave all others untouched
+            name = ', '.join([v.strip() for v in
+                name.split(self.colInternalDelimiter)])
         balance = Decimal(rowValues[3]) if rowValues[3] else Decimal(0)
-        return Member(memberId, name, emails, Decimal(balance))
+        return Member(rowValues[0], name, rowValues[2], balance)
 
     def prefixValues(self):
         return [self.accountingDate]
 
     def csvRows(self):
-        return [[
-            m.id,
-            m.name,
-            ', '.join(m.emails),
-            helpers.formatPrice(m.balance)
-            ]+['' for i in range(self.numAdditionalCols)]
-            for m in self.values()]
+        emptyCols = [''] * self.numAdditionalCols
+        formatPrice = helpers.formatPrice
+        for m in self.values():
+            yield [m.id,
+                m.name,
+                ', '.join(m.emails),
+                formatPrice(m.balance),
+                *emptyCols]
 
 class Product(DatabaseObject):
+    __slots__ = ('description', 'amount', 'unit', 'purchasePrice',
+            'marginPercentage', '__previousQuantity', 'inventoryQuantity',
+            '__addedQuantity', '__soldQuantity', 'sheetsToPrint', 'supplier',
+            'eaternityName', 'origin', 'production', 'transport',
+            'conservation', 'gCo2e', '__expectedQuantity')
+
     def __init__(self,
             description,
             amount,
@@ -381,7 +548,9 @@ class Product(DatabaseObject):
             if not type(conservation) is list:
                 raise TypeError(f'conservation is not a list, "{conservation}"')
 
-        super().__init__(slugify.slugify(description))
+        super().__init__(_productId(description))
+        # set by the quantity setters, which need all of them to exist
+        self.__previousQuantity = self.__addedQuantity = self.__soldQuantity = None
         self.description = description
         self.amount = amount
         self.unit = unit
@@ -400,6 +569,41 @@ class Product(DatabaseObject):
         self.conservation = conservation
         self.gCo2e = gCo2e
 
+    @classmethod
+    def _fromParsedValues(cls, description, amount, unit, purchasePrice,
+            marginPercentage, previousQuantity, inventoryQuantity,
+            addedQuantity, soldQuantity, sheetsToPrint, supplier,
+            eaternityName, origin, production, transport, conservation,
+            gCo2e):
+        """
+        Create a product without the type checks done in __init__
+
+        Only meant for ProductDict.databaseObjectFromCsvRow, which already
+        converted all values to the expected types. Arguments are the same as
+        for __init__, but all of them must be passed positionally.
+        """
+        product = cls.__new__(cls)
+        product.id = _productId(description)
+        product.description = description
+        product.amount = amount
+        product.unit = unit
+        product.purchasePrice = purchasePrice
+        product.marginPercentage = marginPercentage
+        product.__previousQuantity = previousQuantity
+        product.inventoryQuantity = inventoryQuantity
+        product.__addedQuantity = addedQuantity
+        product.__soldQuantity = soldQuantity
+        product.sheetsToPrint = sheetsToPrint
+        product.supplier = supplier
+        product.eaternityName = eaternityName
+        product.origin = origin
+        product.production = production
+        product.transport = transport
+        product.conservation = conservation
+        product.gCo2e = gCo2e
+        product.__updateExpectedQuantity()
+        return product
+
     @property
     def amountAndUnit(self):
         return str(self.amount)+self.unit
@@ -413,6 +617,7 @@ class Product(DatabaseObject):
         if addedQuantity and not type(addedQuantity) is int:
             raise TypeError(f'addedQuantity is not an integer, {addedQuantity}')
         self.__addedQuantity = addedQuantity
+        self.__updateExpectedQuantity()
 
     @property
     def soldQuantity(self):
@@ -423,6 +628,7 @@ class Product(DatabaseObject):
         if soldQuantity and not type(soldQuantity) is int:
             raise TypeError(f'soldQuantity is not an integer, {soldQuantity}')
         self.__soldQuantity = soldQuantity
+        self.__updateExpectedQuantity()
 
     @property
     def previousQuantity(self):
@@ -433,20 +639,41 @@ class Product(DatabaseObject):
         if previousQuantity and not type(previousQuantity) is int:
             raise TypeError(f'previousQuantity is not an integer, {previousQuantity}')
         self.__previousQuantity = previousQuantity
+        self.__updateExpectedQuantity()
 
     @property
     def expectedQuantity(self):
+        return self.__expectedQuantity
+
+    def __updateExpectedQuantity(self):
         if self.__previousQuantity is None \
            or self.__addedQuantity is None \
            or self.__soldQuantity is None:
-           return None
-        return self.previousQuantity+self.addedQuantity-self.soldQuantity
+            self.__expectedQuantity = None
+        else:
+            self.__expectedQuantity = (self.__previousQuantity
+                    + self.__addedQuantity - self.__soldQuantity)
 
     def grossSalesPrice(self):
         return helpers.roundPriceCH(self.purchasePrice * (1 + self.marginPercentage))
 
+    def clone(self):
+        """
+        Copy this product, e.g. to modify it for the next accounting
+
+        Much cheaper than copy.deepcopy: apart from the lists, which are copied,
+        all attributes are immutable and can be shared with the clone.
+        """
+        product = copy.copy(self)
+        for attr in ('sheetsToPrint', 'production', 'conservation'):
+            value = getattr(self, attr)
+            if type(value) is list:
+                setattr(product, attr, list(value))
+        return product
+
 class ProductDict(DatabaseDict):
     logger = logging.getLogger('tagtrail.database.ProductDict')
+    multiValueColumns = (9, 14, 16) # sheetsToPrint, production, conservation
 
     def __init__(self,
             config,
@@ -490,51 +717,65 @@ class ProductDict(DatabaseDict):
                         f'is given, but inventoryQuantity of {rowValues[0]} '
                         'is missing')
 
-        return Product(description = rowValues[0],
-                amount = int(rowValues[1]),
-                unit = rowValues[2],
-                purchasePrice = Decimal(rowValues[3]),
-                marginPercentage = self.productMarginPercentage,
-                previousQuantity = int(rowValues[4]),
-                addedQuantity = 0 if not rowValues[5] else int(rowValues[5]),
-                soldQuantity  = 0 if not rowValues[6] else int(rowValues[6]),
+        # unit, supplier, origin and transport have few distinct values -
+        # intern them so that all products share one object per value
+        return Product._fromParsedValues(rowValues[0], # description
+                int(rowValues[1]), # amount
+                sys.intern(rowValues[2]), # unit
+                Decimal(rowValues[3]), # purchasePrice
+                self.productMarginPercentage,
+                int(rowValues[4]), # previousQuantity
+                # inventoryQuantity
+                None if not rowValues[8] else int(rowValues[8]),
+                0 if not rowValues[5] else int(rowValues[5]), # addedQuantity
+                0 if not rowValues[6] else int(rowValues[6]), # soldQuantity
                 # not reading expectedQuantity
-                inventoryQuantity = None if not rowValues[8] else int(rowValues[8]),
-                sheetsToPrint = rowValues[9],
-                supplier = rowValues[10],
+                rowValues[9], # sheetsToPrint
+                sys.intern(rowValues[10]), # supplier
                 # Comment is not used within tagtrail
-                eaternityName = rowValues[12],
-                origin = rowValues[13],
-                production = rowValues[14],
-                transport = rowValues[15],
-                conservation = rowValues[16],
-                gCo2e = None if not rowValues[17] else int(rowValues[17]))
+                rowValues[12], # eaternityName
+                sys.intern(rowValues[13]), # origin
+                rowValues[14], # production
+                sys.intern(rowValues[15]), # transport
+                rowValues[16], # conservation
+                None if not rowValues[17] else int(rowValues[17])) # gCo2e
 
     def prefixValues(self):
         return ['' if self.previousQuantityDate is None else str(self.previousQuantityDate),
                 '' if self.expectedQuantityDate is None else str(self.expectedQuantityDate),
                 '' if self.inventoryQuantityDate is None else str(self.inventoryQuantityDate)]
 
+    # fetches all exported attributes of a product in one go, in column order
+    _csvFields = operator.attrgetter('description', 'amount', 'unit',
+            'purchasePrice', 'previousQuantity', 'addedQuantity',
+            'soldQuantity', 'expectedQuantity', 'inventoryQuantity',
+            'sheetsToPrint', 'supplier', 'eaternityName', 'origin',
+            'production', 'transport', 'conservation', 'gCo2e')
+
     def csvRows(self):
-        return [[p.description,
-                str(p.amount),
-                p.unit,
-                str(p.purchasePrice),
-                '' if p.previousQuantity is None else str(p.previousQuantity),
-                '' if p.addedQuantity is None else str(p.addedQuantity),
-                '' if p.soldQuantity is None else str(p.soldQuantity),
-                '' if p.expectedQuantity is None else str(p.expectedQuantity),
-                '' if p.inventoryQuantity is None else str(p.inventoryQuantity),
-                '' if p.sheetsToPrint is None else ','.join(p.sheetsToPrint),
-                '' if p.supplier is None else p.supplier,
+        for (description, amount, unit, purchasePrice, previousQuantity,
+                addedQuantity, soldQuantity, expectedQuantity,
+                inventoryQuantity, sheetsToPrint, supplier, eaternityName,
+                origin, production, transport, conservation,
+                gCo2e) in map(self._csvFields, self.values()):
+            yield [description,
+                str(amount),
+                unit,
+                str(purchasePrice),
+                '' if previousQuantity is None else str(previousQuantity),
+                '' if addedQuantity is None else str(addedQuantity),
+                '' if soldQuantity is None else str(soldQuantity),
+                '' if expectedQuantity is None else str(expectedQuantity),
+                '' if inventoryQuantity is None else str(inventoryQuantity),
+                '' if sheetsToPrint is None else ','.join(sheetsToPrint),
+                '' if supplier is None else supplier,
                 '', # Comment is not used within tagtrail
-                '' if p.eaternityName is None else p.eaternityName,
-                '' if p.origin is None else p.origin,
-                '' if p.production is None else ','.join(p.production),
-                '' if p.transport is None else p.transport,
-                '' if p.conservation is None else ','.join(p.conservation),
-                '' if p.gCo2e is None else str(p.gCo2e)]
-                for p in self.values()]
+                '' if eaternityName is None else eaternityName,
+                '' if origin is None else origin,
+                '' if production is None else ','.join(production),
+                '' if transport is None else transport,
+                '' if conservation is None else ','.join(conservation),
+                '' if gCo2e is None else str(gCo2e)]
 
     def copyForNext(self, currentDate, clearAddedQuantity, clearSoldQuantity):
         """
@@ -557,7 +798,9 @@ class ProductDict(DatabaseDict):
         """
         assert(self.inventoryQuantityDate is None or self.inventoryQuantityDate == currentDate)
 
-        newProducts = copy.deepcopy(self)
+        newProducts = copy.copy(self)
+        for productId, product in self.items():
+            newProducts[productId] = product.clone()
         newProducts.previousQuantityDate = currentDate
         newProducts.expectedQuantityDate = None
         newProducts.inventoryQuantityDate = None
@@ -601,6 +844,13 @@ class ProductDict(DatabaseDict):
         return newProducts
 
 class BillPosition(DatabaseObject):
+    """
+    Do not modify a position once it is part of a Bill - replace it, as the
+    bill caches the totals of its positions.
+    """
+    __slots__ = ('description', 'numTags', 'unitPurchasePrice',
+            'unitGrossSalesPrice', 'gCo2e')
+
     def __init__(self,
             productId,
             description,
@@ -640,6 +890,9 @@ class Bill(DatabaseDict):
             **kwargs
             ):
         super().__init__(config, **kwargs)
+        # (totalGrossSalesPrice, totalPurchasePrice, totalGCo2e) of all
+        # positions, computed on demand and reset whenever positions change
+        self.__positionTotals = None
         self.memberId = memberId
         self.previousAccountingDate = previousAccountingDate \
                 if isinstance(previousAccountingDate, datetime.date) else \
@@ -691,8 +944,61 @@ class Bill(DatabaseDict):
         self.__correctionTransaction = transaction
         self.__correctionJustification = justification
 
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.__positionTotals = None
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.__positionTotals = None
+
+    def pop(self, *args):
+        self.__positionTotals = None
+        return super().pop(*args)
+
+    def popitem(self):
+        self.__positionTotals = None
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self.__positionTotals = None
+
+    def bulkLoad(self, dbObjects):
+        super().bulkLoad(dbObjects)
+        self.__positionTotals = None
+
+    def positionTotals(self):
+        """
+        Sum up gross sales price, purchase price and gCo2e of all positions
+
+        All three are summed up in a single pass, and the result is cached
+        until positions are added, replaced or removed. Positions themselves
+        must not be modified in place, the cache would not notice.
+
+        :return: (totalGrossSalesPrice, totalPurchasePrice, totalGCo2e),
+            totalPurchasePrice is None if the unitPurchasePrice of any position
+            is unknown (e.g. for bills read from file)
+        :rtype: (Decimal, Decimal, int)
+        """
+        if self.__positionTotals is None:
+            totalGrossSalesPrice = Decimal(0)
+            totalPurchasePrice = Decimal(0)
+            totalGCo2e = 0
+            for p in self.values():
+                totalGrossSalesPrice += p.numTags * p.unitGrossSalesPrice
+                if p.unitPurchasePrice is None:
+                    totalPurchasePrice = None
+                elif totalPurchasePrice is not None:
+                    totalPurchasePrice += p.numTags * p.unitPurchasePrice
+                if p.gCo2e is not None:
+                    totalGCo2e += p.numTags * p.gCo2e
+            self.__positionTotals = (totalGrossSalesPrice, totalPurchasePrice,
+                    totalGCo2e)
+        return self.__positionTotals
+
     def totalGCo2e(self):
-        totalGCo2e = sum([0 if p.totalGCo2e() == None else p.totalGCo2e() for p in self.values()])
+        totalGCo2e = self.positionTotals()[2]
         if (self.expectedTotalGCo2e and int(totalGCo2e) !=
                 int(self.expectedTotalGCo2e)):
             raise ValueError(f'expectedTotalGCo2e ({self.expectedTotalGCo2e}) is '
@@ -700,8 +1006,7 @@ class Bill(DatabaseDict):
         return totalGCo2e
 
     def totalGrossSalesPrice(self):
-        totalGrossSalesPrice = Decimal(sum([p.totalGrossSalesPrice()
-            for p in self.values()]))
+        totalGrossSalesPrice = self.positionTotals()[0]
 
         if (self.expectedTotalPrice and
                 Decimal(helpers.formatPrice(totalGrossSalesPrice)) !=
@@ -711,20 +1016,24 @@ class Bill(DatabaseDict):
         return totalGrossSalesPrice
 
     def totalPurchasePrice(self):
-        return Decimal(sum([p.totalPurchasePrice() for p in
-            self.values()]))
+        totalPurchasePrice = self.positionTotals()[1]
+        if totalPurchasePrice is None:
+            raise TypeError(f'bill of {self.memberId} has positions without '
+                    'unitPurchasePrice')
+        return totalPurchasePrice
 
     @property
     def currentBalance(self):
+        totalGrossSalesPrice = self.totalGrossSalesPrice()
         currentBalance = self.previousBalance + self.totalPayments + \
-                self.correctionTransaction - self.totalGrossSalesPrice()
+                self.correctionTransaction - totalGrossSalesPrice
         if (self.currentExpectedBalance and
                 Decimal(helpers.formatPrice(currentBalance)) !=
                 self.currentExpectedBalance):
             raise ValueError(f'inconsistent price calculation for {self.memberId},\n'
                     + f'({currentBalance} == {self.previousBalance} + '
                     + f'{self.totalPayments} + {self.correctionTransaction} - '
-                            + f'{self.totalGrossSalesPrice()}) != {self.currentExpectedBalance}')
+                            + f'{totalGrossSalesPrice}) != {self.currentExpectedBalance}')
         return currentBalance
 
     @classmethod
@@ -768,31 +1077,39 @@ class Bill(DatabaseDict):
                 self.totalGCo2e()]
 
     def csvRows(self):
-        return [[p.id,
-            p.description,
-            str(p.numTags),
-            helpers.formatPrice(p.unitGrossSalesPrice),
-            'None' if p.gCo2e is None else str(p.gCo2e),
-            'None' if p.totalGrossSalesPrice() is None else helpers.formatPrice(p.totalGrossSalesPrice()),
-            'None' if p.totalGCo2e() is None else str(p.totalGCo2e())]
-                for p in self.values()]
+        formatPrice = helpers.formatPrice
+        for p in self.values():
+            totalGrossSalesPrice = p.totalGrossSalesPrice()
+            totalGCo2e = p.totalGCo2e()
+            yield [p.id,
+                p.description,
+                str(p.numTags),
+                formatPrice(p.unitGrossSalesPrice),
+                'None' if p.gCo2e is None else str(p.gCo2e),
+                'None' if totalGrossSalesPrice is None else formatPrice(totalGrossSalesPrice),
+                'None' if totalGCo2e is None else str(totalGCo2e)]
 
     def __str__(self):
-        text = self.textRepresentationHeader + '\n'
+        lines = [self.textRepresentationHeader]
+        formatRow = self.textRepresentationRow.format
         for p in self.values():
-            text += (self.textRepresentationRow + '\n').format(
+            totalGCo2e = p.totalGCo2e()
+            lines.append(formatRow(
                     description=p.description,
                     numTags=p.numTags,
                     unitPrice=helpers.formatPrice(p.unitGrossSalesPrice),
                     totalPrice=helpers.formatPrice(p.totalGrossSalesPrice()),
-                    totalGCo2e='?' if p.totalGCo2e() is None else p.totalGCo2e()
-                    )
-        text += '\n' + self.textRepresentationFooter.format(
+                    totalGCo2e='?' if totalGCo2e is None else totalGCo2e
+                    ))
+        lines.append('')
+        lines.append(self.textRepresentationFooter.format(
                 totalPrice=helpers.formatPrice(self.totalGrossSalesPrice()),
-                totalGCo2e=self.totalGCo2e())
-        return text
+                totalGCo2e=self.totalGCo2e()))
+        return '\n'.join(lines)
 
 class MemberAccount(DatabaseObject):
+    __slots__ = ()
+
     def __init__(self,
             memberId):
         super().__init__(memberId)
@@ -827,12 +1144,16 @@ class MemberAccountDict(DatabaseDict):
         return []
 
     def csvRows(self):
-        return [[self.type, self.prefix+a.id, a.id,
-                '', '', '', '', self.commoditym, self.commodityn, self.hidden,
-                self.tax, self.placeHolder]
-                for a in self.values()]
+        # all columns after the account name are the same for every member
+        constantCols = ['', '', '', '', self.commoditym, self.commodityn,
+                self.hidden, self.tax, self.placeHolder]
+        for a in self.values():
+            yield [self.type, self.prefix+a.id, a.id, *constantCols]
 
 class GnucashTransaction:
+    __slots__ = ('description', 'amount', 'sourceAccount', 'targetAccount',
+            'date')
+
     def __init__(self,
             description,
             amount,
@@ -871,9 +1192,11 @@ class GnucashTransactionList(DatabaseList):
         return []
 
     def csvRows(self):
-        return [[helpers.DateUtility.strftime(t.date), t.description, t.sourceAccount,
-                helpers.formatPrice(t.amount), t.targetAccount]
-                for t in self]
+        strftime = helpers.DateUtility.strftime
+        formatPrice = helpers.formatPrice
+        for t in self:
+            yield [strftime(t.date), t.description, t.sourceAccount,
+                formatPrice(t.amount), t.targetAccount]
 
 class CorrectionTransaction(DatabaseObject):
     """
@@ -891,6 +1214,8 @@ class CorrectionTransaction(DatabaseObject):
 
     to 0_input/correctionTransactions.csv
     """
+    __slots__ = ('amount', 'justification')
+
     def __init__(self,
             memberId,
             amount,
@@ -932,11 +1257,15 @@ class CorrectionTransactionDict(DatabaseDict):
         return []
 
     def csvRows(self):
-        return [[t.id, helpers.formatPrice(t.amount), t.justification]
-                for t in self.values()]
+        formatPrice = helpers.formatPrice
+        for t in self.values():
+            yield [t.id, formatPrice(t.amount), t.justification]
 
 class PostfinanceTransaction:
+    __slots__ = ('bookingDate', 'notificationText', 'creditAmount',
+            'debitAmount', 'value', 'balance', 'memberId')
     messagePrefix = 'MITTEILUNGEN:'
+
     def __init__(self,
             bookingDate,
             notificationText,
@@ -980,17 +1309,26 @@ class PostfinanceTransaction:
         If no memberId can be retrieved, or the memberId is not in possibleIds,
         None is returned. If a memberId is returned, you can assume it is the
         correct one.
+
+        :param possibleIds: valid member ids, preferably a set as it is
+            probed with `in`
+        :type possibleIds: set of str
+        :return: memberId or None
+        :rtype: str
         """
-        match = re.split(self.messagePrefix+'\s*', self.notificationText)
-        if match is None or len(match) != 2:
+        text = self.notificationText
+        prefixStart = text.find(self.messagePrefix)
+        if prefixStart == -1:
+            return None
+        messageStart = prefixStart + len(self.messagePrefix)
+        if text.find(self.messagePrefix, messageStart) != -1:
+            return None
+        words = text[messageStart:].split(None, 1)
+        memberId = words[0] if words else ''
+        if not memberId in possibleIds:
             return None
         else:
-            messageAndBehind = match[1]
-            messageMatch = re.split('\s', messageAndBehind)
-            if messageMatch is None or not messageMatch[0] in possibleIds:
-                return None
-            else:
-                return messageMatch[0]
+            return memberId
 
     def mostLikelyMemberId(self, possibleIds):
         """
@@ -998,9 +1336,17 @@ class PostfinanceTransaction:
 
         If no single most likely candidate is found, None is returned.
         """
+        upperText = self.notificationText.upper()
+        # words enclosed in single spaces - a memberId has to be one of them
+        upperWords = set(upperText.split(' ')[1:-1])
         mostLikelyMemberId = None
         for memberId in possibleIds:
-            if self.notificationText.upper().find(f' {memberId.upper()} ') != -1:
+            upperId = memberId.upper()
+            if ' ' in upperId:
+                found = upperText.find(f' {upperId} ') != -1
+            else:
+                found = upperId in upperWords
+            if found:
                 if mostLikelyMemberId is None:
                     mostLikelyMemberId = memberId
                 else:
@@ -1044,20 +1390,23 @@ class PostfinanceTransactionList(DatabaseList):
         self.dateFrom = helpers.DateUtility.strptime(dateFrom, self.prefixRowDateFormat)
         self.dateTo = helpers.DateUtility.strptime(dateTo, self.prefixRowDateFormat)
 
+    # empty lines and the disclaimer PostFinance appends to its exports
+    ignoredRows = frozenset([
+            (),
+            ('Disclaimer:',),
+            ('Disclaimer:', '', '', '', '', ''),
+            ('This is not a document created by PostFinance Ltd. PostFinance Ltd is not responsible for the content.',),
+            ('This is not a document created by PostFinance Ltd. PostFinance Ltd is not responsible for the content.',
+                '', '', '', '', ''),
+            ('', '', '', '', '', ''),
+            ])
+
     @classmethod
     def configSection(cls):
         return 'postfinance_transactions'
 
     def databaseObjectFromCsvRow(self, rowValues):
-        if rowValues in [
-                [],
-                ['Disclaimer:'],
-                ['Disclaimer:', '', '', '', '', ''],
-                ['This is not a document created by PostFinance Ltd. PostFinance Ltd is not responsible for the content.'],
-                ['This is not a document created by PostFinance Ltd. PostFinance Ltd is not responsible for the content.',
-                    '', '', '', '', ''],
-                ['', '', '', '', '', ''],
-                ]:
+        if tuple(rowValues) in self.ignoredRows:
             return None
         bookingDate = helpers.DateUtility.strptime(rowValues[0],
                     self.contentDateFormat)
@@ -1087,10 +1436,13 @@ class PostfinanceTransactionList(DatabaseList):
                 '']
 
     def csvRows(self):
-        return [[helpers.DateUtility.strftime(t.bookingDate, self.contentDateFormat),
-            t.notificationText,
-            '' if t.creditAmount is None else helpers.formatPrice(t.creditAmount),
-            '' if t.debitAmount is None else helpers.formatPrice(t.debitAmount),
-            t.value,
-            '' if t.balance is None else helpers.formatPrice(t.balance)]
-                for t in self]
+        strftime = helpers.DateUtility.strftime
+        formatPrice = helpers.formatPrice
+        contentDateFormat = self.contentDateFormat
+        for t in self:
+            yield [strftime(t.bookingDate, contentDateFormat),
+                t.notificationText,
+                '' if t.creditAmount is None else formatPrice(t.creditAmount),
+                '' if t.debitAmount is None else formatPrice(t.debitAmount),
+                t.value,
+                '' if t.balance is None else formatPrice(t.balance)]
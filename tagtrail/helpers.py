@@ -17,6 +17,7 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from abc import ABC, abstractmethod
+import functools
 import shutil
 import os
 import datetime
@@ -120,13 +121,25 @@ class DateUtility:
         return DateUtility.today().strftime(cls.dateFormat)
 
     @classmethod
+    @functools.lru_cache(maxsize=256)
     def strftime(cls, date, dateFormat = None):
+        """
+        Format a date, e.g. the booking date of a transaction
+
+        Results are cached - a csv file repeats the same few dates.
+        """
         if dateFormat is None:
             dateFormat = cls.dateFormat
         return date.strftime(dateFormat)
 
     @classmethod
+    @functools.lru_cache(maxsize=256)
     def strptime(cls, dateStr, dateFormat = None):
+        """
+        Parse a date string, e.g. a prefix value of a csv file
+
+        Results are cached - the same few dates are found in many files.
+        """
         if dateFormat is None:
             dateFormat = cls.dateFormat
         try:
@@ -150,6 +163,11 @@ def readPrefixRow(prefix, row):
         raise ValueError(f"row[0] = '{row[0]}', but expected '{prefix}'")
     return row[1]
 
+# constants used by the price helpers below, which run for every bill position
+_twenty = Decimal(20)
+_cent = Decimal('.01')
+_nonPriceCharacters = re.compile(r'[^\d.]')
+
 def roundPriceCH(price):
     """
     Round price to 5-cent precision
@@ -158,8 +176,7 @@ def roundPriceCH(price):
     :type price: Decimal
     :return: Decimal
     """
-    twenty = Decimal(20)
-    return round(price * twenty) / twenty
+    return round(price * _twenty) / _twenty
 
 def formatPrice(price, currency = None):
     """
@@ -174,15 +191,14 @@ def formatPrice(price, currency = None):
     if not isinstance(price, Decimal):
         raise TypeError(f'price must be a Decimal, type is {type(price)}')
 
-    template = Decimal(".01")
     if currency is None:
-        return f'{price.quantize(template)}'
+        return str(price.quantize(_cent))
     else:
-        return f'{price.quantize(template)} {currency}'
+        return f'{price.quantize(_cent)} {currency}'
 
 
 def priceFromFormatted(priceStr):
-    numberOnly = ''.join(re.findall('\d|\.', priceStr))
+    numberOnly = _nonPriceCharacters.sub('', priceStr)
     if numberOnly:
         return Decimal(numberOnly)
     else:
@@ -275,7 +275,6 @@ class ProductSheet(ABC):
             for cnt, row in enumerate(reader):
                 if cnt<skipCnt:
                     continue
-                self._logger.debug(f"row={row}")
                 boxName, text, confidence = row[0], row[1], float(row[2])
                 if boxName == "frameBox":
                     continue
@@ -287,6 +286,7 @@ class ProductSheet(ABC):
                 self._boxes[boxName].name = boxName
                 self._boxes[boxName].text = text
                 self._boxes[boxName].confidence = confidence
+        self._logger.debug(f'Loaded {numDataBoxes} data boxes from {path}')
 
     @property
     def filename(self):
@@ -512,7 +512,7 @@ class Model():
                 "Run tagtrail_bankimport before tagtrail_account!")
 
         unprocessedPayments = [t.notificationText for t in
-                self.db.readCsv(unprocessedTransactionsPath,
+                self.db.iterCsv(unprocessedTransactionsPath,
                     database.PostfinanceTransactionList)
                  if not t.creditAmount is None]
         if unprocessedPayments != []:
@@ -565,10 +565,15 @@ class Model():
                 'inventory_difference')
         inventoryDifferenceAccount = self.db.config.get('tagtrail_account',
                 'inventory_difference_account')
+        merchandiseValueAccount = self.db.config.get('tagtrail_account',
+                'merchandise_value_account')
+        marginAccount = self.db.config.get('tagtrail_account', 'margin_account')
+        minNotableInventoryDifference = self.db.config.getint('tagtrail_account',
+                'min_notable_inventory_difference')
+        currency = self.db.config.get('general', 'currency')
         self.logger.info('Notable differences between inventory and expected quantities:\n')
         totalInventoryDifference = 0
-        priceFormatter = lambda price: helpers.formatPrice(price,
-                self.db.config.get('general', 'currency'))
+        priceFormatter = lambda price: helpers.formatPrice(price, currency)
         inventoryDifferenceMessages = []
         for product in self.db.products.values():
             if product.inventoryQuantity is None:
@@ -589,24 +594,21 @@ class Model():
                 transactions.append(database.GnucashTransaction(
                     f'{product.id}: {inventoryDifference} accounted on {self.accountingDate}',
                     purchasePriceDifference,
-                    self.db.config.get('tagtrail_account',
-                        'merchandise_value_account'),
+                    merchandiseValueAccount,
                     inventoryDifferenceAccount,
                     self.accountingDate
                     ))
                 transactions.append(database.GnucashTransaction(
                     f'{product.id}: {inventoryDifference} accounted on {self.accountingDate}',
                     grossSalesPriceDifference - purchasePriceDifference,
-                    self.db.config.get('tagtrail_account', 'margin_account'),
+                    marginAccount,
                     inventoryDifferenceAccount,
                     self.accountingDate
                     ))
 
         for (priceDifference, msg) in sorted(inventoryDifferenceMessages, key =
                 lambda pair: pair[0], reverse=True):
-            if (priceDifference >
-                self.db.config.getint('tagtrail_account',
-                    'min_notable_inventory_difference')):
+            if priceDifference > minNotableInventoryDifference:
                 self.logger.info(msg)
             else:
                 self.logger.debug(msg)
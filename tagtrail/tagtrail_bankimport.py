@@ -86,8 +86,9 @@ class EnrichedDatabase(database.Database):
             raise ValueError(
                     f"'Date to'='{loadedTransactions.dateTo}' must " + \
                     f"be one day before the current accounting date '{toDate}'")
+        memberIds = set(self.members.keys())
         for transaction in loadedTransactions:
-            transaction.memberId = transaction.inferMemberId(list(sorted(self.members.keys())))
+            transaction.memberId = transaction.inferMemberId(memberIds)
             self.logger.debug(f'inferred memberId {transaction.memberId}')
         return loadedTransactions
 
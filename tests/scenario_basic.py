@@ -3,6 +3,7 @@
 from .scenario_ocr import OcrTest
 from .scenario_gen import GenTest
 from .scenario_account import AccountTest
+from .scenario_database import DatabaseTest
 from .context import helpers
 
 import unittest
@@ -22,6 +23,10 @@ class BasicAccountTest(AccountTest):
     def setUp(self):
         self.baseSetUp('basic')
 
+class BasicDatabaseTest(DatabaseTest):
+    def setUp(self):
+        self.baseSetUp('basic')
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Test tagtrail_gen')
     parser.add_argument('--logLevel', dest='logLevel',
@@ -32,7 +37,8 @@ if __name__ == '__main__':
 
     loader = unittest.TestLoader()
     completeSuite = unittest.TestSuite()
-    for suite in [BasicOcrTest, BasicGenTest, BasicAccountTest]:
+    for suite in [BasicOcrTest, BasicGenTest, BasicAccountTest,
+            BasicDatabaseTest]:
         for test in loader.loadTestsFromTestCase(suite):
             completeSuite.addTest(test)
     runner = unittest.TextTestRunner()
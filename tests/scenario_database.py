@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+from .context import helpers
+from .context import database
+from .test_helpers import TagtrailTestCase
+
+import logging
+import csv
+import io
+import unittest
+import shutil
+from decimal import Decimal
+
+class DatabaseTest(TagtrailTestCase):
+    """ Tests of reading and writing csv files with database.Database """
+
+    def setUp(self):
+        if __name__ != '__main__':
+            self.skipTest(reason = 'only run when invoked directly')
+        self.baseSetUp('medium')
+
+    def baseSetUp(self, templateName):
+        self.templateName = templateName
+        self.templateRootDir = f'tests/data/template_{self.templateName}/'
+
+        self.tmpDir = 'tests/tmp/'
+        self.testRootDir = f'{self.tmpDir}{self.templateName}/'
+
+        self.logger = logging.getLogger('tagtrail.tests.scenario_database.DatabaseTest')
+        self.logger.info(f'\nStarting test {self.id()}\n')
+        helpers.recreateDir(self.tmpDir)
+        shutil.copytree(self.templateRootDir, self.testRootDir)
+        self.db = database.Database(f'{self.testRootDir}0_input/')
+
+    def write_quoted_csv(self, path, rows):
+        """
+        Write rows to path like a spreadsheet application would, quoting every
+        field and terminating lines with '\\r\\n'
+
+        :param path: path of the csv file to write
+        :type path: str
+        :param rows: rows to write
+        :type rows: list of list of str
+        """
+        with open(path, 'w', newline='', encoding='utf-8') as fout:
+            csv.writer(fout, delimiter=';', quotechar='"',
+                    quoting=csv.QUOTE_ALL, lineterminator='\r\n').writerows(rows)
+
+    def test_unquoted_rows_match_csv_reader(self):
+        """
+        Files without quote characters are split without csv.reader - the
+        rows have to be the same as csv.reader's anyway
+        """
+        for data in ['a;b;c\nd;;f\n',
+                'a;b;c\r\nd;;f\r\n',
+                'a;b;c\rd;;f\r',
+                'a;b;c\r\n\r\nd;;f',
+                '\n;\n;;\n',
+                '']:
+            self.assertEqual(
+                    list(database._unquotedCsvRows(data, ';')),
+                    list(csv.reader(io.StringIO(data, newline=''),
+                        delimiter=';', quotechar='"')),
+                    f'rows of {data!r} differ')
+
+    def test_quoted_and_unquoted_csv_files(self):
+        """
+        A quoted file with '\\r\\n' line endings has to be read the same as an
+        unquoted one, and a quoted field may contain the delimiter
+        """
+        unquotedPath = f'{self.testRootDir}0_input/unquoted.csv'
+        quotedPath = f'{self.testRootDir}0_input/quoted.csv'
+        rows = [['memberId', 'Amount', 'Justification'],
+                ['APFV', '42.42', 'Correction needed'],
+                ['LIPA', '-3.5', 'Correction needed, too']]
+        with open(unquotedPath, 'w', newline='', encoding='utf-8') as fout:
+            fout.write(''.join(';'.join(row) + '\r\n' for row in rows))
+        self.write_quoted_csv(quotedPath, rows)
+
+        unquoted = self.db.readCsv(unquotedPath,
+                database.CorrectionTransactionDict)
+        quoted = self.db.readCsv(quotedPath,
+                database.CorrectionTransactionDict)
+        self.assertEqual(
+                [(t.id, t.amount, t.justification) for t in unquoted.values()],
+                [(t.id, t.amount, t.justification) for t in quoted.values()])
+        self.assertEqual(unquoted['LIPA'].amount, Decimal('-3.5'))
+
+        rows[1][2] = 'Correction; needed'
+        self.write_quoted_csv(quotedPath, rows)
+        quoted = self.db.readCsv(quotedPath,
+                database.CorrectionTransactionDict)
+        self.assertEqual(quoted['APFV'].justification, 'Correction; needed')
+
+    def test_iter_csv_yields_same_objects_as_read_csv(self):
+        """
+        iterCsv has to yield the database objects readCsv collects
+        """
+        productsPath = f'{self.testRootDir}0_input/products.csv'
+        products = self.db.readCsv(productsPath, database.ProductDict)
+        productValues = lambda p: (p.id, p.description, p.amount, p.unit,
+                p.purchasePrice, p.previousQuantity, p.addedQuantity,
+                p.soldQuantity, p.inventoryQuantity, p.expectedQuantity,
+                p.supplier, p.gCo2e)
+        self.assertNotEqual(len(products), 0)
+        self.assertEqual(
+                [productValues(p) for p in products.values()],
+                [productValues(p) for p in
+                    self.db.iterCsv(productsPath, database.ProductDict)])
+
+        transactionsPath = (f'{self.testRootDir}0_input/'
+                'export_transactions_20200102_20210331.csv')
+        transactions = self.db.readCsv(transactionsPath,
+                database.PostfinanceTransactionList)
+        transactionValues = lambda t: (t.bookingDate, t.notificationText,
+                t.creditAmount, t.debitAmount, t.value, t.balance)
+        self.assertNotEqual(len(transactions), 0)
+        self.assertEqual(
+                [transactionValues(t) for t in transactions],
+                [transactionValues(t) for t in self.db.iterCsv(
+                    transactionsPath, database.PostfinanceTransactionList)])
+
+    def test_iter_csv_raises_like_read_csv(self):
+        """
+        An invalid header or row has to raise the same ValueError, naming the
+        file, in iterCsv and readCsv
+        """
+        productsPath = f'{self.testRootDir}0_input/products.csv'
+        with open(productsPath, 'r', newline='', encoding='utf-8') as fin:
+            lines = fin.readlines()
+        numPrefixRows = len(self.db.csvLayout(database.ProductDict)[0])
+
+        invalidHeaderLines = list(lines)
+        invalidHeaderLines[numPrefixRows] = 'Invalid header' + \
+                invalidHeaderLines[numPrefixRows]
+        invalidRowLines = list(lines)
+        invalidRowLines[numPrefixRows+1] = ';'.join(
+                ['not an amount' if i == 1 else val for i, val in
+                    enumerate(invalidRowLines[numPrefixRows+1].split(';'))])
+
+        for invalidLines in [invalidHeaderLines, invalidRowLines]:
+            with open(productsPath, 'w', newline='', encoding='utf-8') as fout:
+                fout.writelines(invalidLines)
+
+            with self.assertRaises(ValueError) as readCsvError:
+                self.db.readCsv(productsPath, database.ProductDict)
+            with self.assertRaises(ValueError) as iterCsvError:
+                list(self.db.iterCsv(productsPath, database.ProductDict))
+            self.assertTrue(str(readCsvError.exception).startswith(
+                f'{productsPath}: '))
+            self.assertEqual(str(readCsvError.exception),
+                    str(iterCsvError.exception))
+
+    def test_comma_in_free_text_round_trips(self):
+        """
+        Free text columns are no lists - a comma in a bill position
+        description or a correction justification has to be read and
+        written back unchanged
+        """
+        billPath = f'{self.testRootDir}bill.csv'
+        with open('tests/data/account_medium/3_bills/to_be_sent/2TRO.csv',
+                'r', encoding='utf-8') as fin:
+            billText = fin.read()
+        billText = billText.replace('Reason for correction;\n',
+                'Reason for correction;Lost, found again\n')
+        billText = billText.replace(';Spaghetti;', ';Spaghetti, Vollkorn;')
+        with open(billPath, 'w', encoding='utf-8') as fout:
+            fout.write(billText)
+
+        bill = self.db.readCsv(billPath, database.Bill)
+        self.assertEqual(bill['spaghetti'].description, 'Spaghetti, Vollkorn')
+        self.assertEqual(bill.correctionJustification, 'Lost, found again')
+        self.db.writeCsv(billPath, bill)
+        with open(billPath, 'r', encoding='utf-8') as fin:
+            self.assertEqual(fin.read(), billText)
+
+        correctionsPath = f'{self.testRootDir}0_input/correctionTransactions.csv'
+        corrections = self.db.readCsv(correctionsPath,
+                database.CorrectionTransactionDict)
+        self.assertNotEqual(len(corrections), 0)
+        for correction in corrections.values():
+            correction.justification = 'Lost, found again'
+        self.db.writeCsv(correctionsPath, corrections)
+        with open(correctionsPath, 'r', encoding='utf-8') as fin:
+            writtenCorrections = fin.read()
+
+        readCorrections = self.db.readCsv(correctionsPath,
+                database.CorrectionTransactionDict)
+        for correction in readCorrections.values():
+            self.assertEqual(correction.justification, 'Lost, found again')
+        self.db.writeCsv(correctionsPath, readCorrections)
+        with open(correctionsPath, 'r', encoding='utf-8') as fin:
+            self.assertEqual(fin.read(), writtenCorrections)
+
+    def test_bill_totals_follow_positions(self):
+        """
+        Bill caches the totals of its positions - adding, replacing or
+        removing a position has to update them
+        """
+        bill = self.db.readCsv(
+                'tests/data/account_medium/3_bills/to_be_sent/2TRO.csv',
+                database.Bill)
+        # Bill.totalGrossSalesPrice checks the positions against the total
+        # read from file - look at the cached totals to change them freely
+        totalGrossSalesPrice = lambda: bill.positionTotals()[0]
+        initialTotal = totalGrossSalesPrice()
+        self.assertNotEqual(initialTotal, 0)
+        newPosition = lambda numTags: database.BillPosition('testproduct',
+                'Test product', numTags, None, Decimal('1.50'), None)
+
+        bill['testproduct'] = newPosition(2)
+        self.assertEqual(totalGrossSalesPrice(),
+                initialTotal + Decimal('3.00'))
+        bill['testproduct'] = newPosition(3)
+        self.assertEqual(totalGrossSalesPrice(),
+                initialTotal + Decimal('4.50'))
+        del bill['testproduct']
+        self.assertEqual(totalGrossSalesPrice(), initialTotal)
+
+        bill.update(testproduct = newPosition(1))
+        self.assertEqual(totalGrossSalesPrice(),
+                initialTotal + Decimal('1.50'))
+        bill.pop('testproduct')
+        self.assertEqual(totalGrossSalesPrice(), initialTotal)
+
+        bill |= {'testproduct': newPosition(4)}
+        self.assertEqual(totalGrossSalesPrice(),
+                initialTotal + Decimal('6.00'))
+        bill.popitem()
+        self.assertEqual(totalGrossSalesPrice(), initialTotal)
+
+        bill.clear()
+        self.assertEqual(totalGrossSalesPrice(), 0)
+
+    def test_member_emails_are_normalized(self):
+        """
+        Emails are always read as a list of stripped addresses, a name is
+        only normalized if it is given as a list
+        """
+        membersPath = f'{self.testRootDir}0_input/members.tsv'
+        with open(membersPath, 'r', newline='', encoding='utf-8') as fin:
+            lines = fin.readlines()
+        numPrefixRows = len(self.db.csvLayout(database.MemberDict)[0])
+        names = {'LIPA': 'Jayvion Odom ', 'ACKI': 'Lynn,Caitlyn ',
+                'LILA': 'Bruce Durham'}
+        emails = {'LIPA': ' test1@gmail.com ', 'ACKI': 'a@b.ch,c@d.ch ',
+                'LILA': ''}
+        for idx in range(numPrefixRows+1, len(lines)):
+            vals = lines[idx].split('\t')
+            if vals[0] in names:
+                vals[1] = names[vals[0]]
+                vals[2] = emails[vals[0]]
+                lines[idx] = '\t'.join(vals)
+        with open(membersPath, 'w', newline='', encoding='utf-8') as fout:
+            fout.writelines(lines)
+
+        members = self.db.readCsv(membersPath, database.MemberDict)
+        self.assertEqual(members['LIPA'].emails, ['test1@gmail.com'])
+        self.assertEqual(members['ACKI'].emails, ['a@b.ch', 'c@d.ch'])
+        self.assertEqual(members['LILA'].emails, [])
+        self.assertEqual(members['LIPA'].name, 'Jayvion Odom ')
+        self.assertEqual(members['ACKI'].name, 'Lynn, Caitlyn')
+        self.assertEqual(members['LILA'].name, 'Bruce Durham')
+
+        self.db.writeCsv(membersPath, members)
+        with open(membersPath, 'r', newline='', encoding='utf-8') as fin:
+            writtenRows = {vals[0]: vals[1:3] for vals in
+                    csv.reader(fin, delimiter='\t')}
+        self.assertEqual(writtenRows['LIPA'],
+                ['Jayvion Odom ', 'test1@gmail.com'])
+        self.assertEqual(writtenRows['ACKI'],
+                ['Lynn, Caitlyn', 'a@b.ch, c@d.ch'])
+        self.assertEqual(writtenRows['LILA'], ['Bruce Durham', ''])